@@ -2,15 +2,464 @@
 This class is responsible for storing the information for the current State of the game and
 determining the valid moves at the current state and also keeps a move log.
 """
+from array import array
+import random
+
+# Piece types. A bitboard index is color * 6 + piece type
+PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+PIECE_CHARS = "pRNBQK"
+EMPTY = 12  # index of an empty square in PIECE_NAMES
+PIECE_NAMES = [color + piece for color in "wb" for piece in PIECE_CHARS] + ["--"]  # 'wp', 'wR', ..., 'bK', '--'
+PIECE_INDEX = {name: i for i, name in enumerate(PIECE_NAMES)}
+
+# Moves are packed into ints: start square | end square << 6 | piece moved << 12 | piece captured << 16 | flags << 20
+# Pieces are PIECE_NAMES indices (EMPTY when nothing is captured), squares are row * 8 + col
+PROMOTION_FLAG = 1
+ROWS_TO_RANKS = ("8", "7", "6", "5", "4", "3", "2", "1")  # rank of each row
+COLS_TO_FILES = ("a", "b", "c", "d", "e", "f", "g", "h")  # file of each col
+SQ_NAMES = [file + rank for rank in ROWS_TO_RANKS for file in COLS_TO_FILES]  # chess notation of each square
+MAX_MOVES = 256  # room for every move of any position, the most known is 218
+PIN_CACHE_SIZE = 1 << 16  # positions getCheckersAndPins remembers before its cache is emptied
+MOVES_CACHE_SIZE = 1 << 14  # positions getValidMoves remembers before its cache is emptied
+NO_PINS = {}  # the pin table shared by every position without pins, never written to
+
+# Transposition table: TT_SIZE slots indexed by the low bits of the Zobrist key. A slot is the full key in
+# ttKeys and the entry packed into ttData: best move | flag << 24 | depth << 26 | (value + TT_VALUE_OFFSET) << 32
+TT_SIZE = 1 << 18  # a power of two
+TT_EXACT, TT_LOWER, TT_UPPER, TT_PERFT = range(4)  # what the value of an entry is: a score, its bounds or a perft count
+TT_MAX_DEPTH = 63
+TT_VALUE_OFFSET = 1 << 31  # values from -TT_VALUE_OFFSET up to TT_VALUE_OFFSET - 1 fit an entry
+# Search scores are material in PIECE_VALUE units from the side to move's point of view. Being mated is scored
+# -MATE_VALUE plus the plies to the mate, so a nearer mate scores further from 0
+MATE_VALUE = 10000
+MATE_BOUND = MATE_VALUE - 1000  # scores beyond +-MATE_BOUND are mates
+MAX_PLY = 128  # room for a search to TT_MAX_DEPTH plus the captures, promotions and evasions of its quiescence search
+FULL_BOARD = (1 << 64) - 1
+FILE_A = 0x0101010101010101  # col 0
+FILE_H = FILE_A << 7  # col 7
+RANK_3 = 0xFF << 40  # row 5, where a white pawn lands after its first single push
+RANK_6 = 0xFF << 16  # row 2, the same for black
+# Everything but the edge files, for masking out the squares a shifted bitboard wrapped around to
+NOT_A = FULL_BOARD ^ FILE_A
+NOT_H = FULL_BOARD ^ FILE_H
+
+# (row, col) steps of the pieces, for the attack tables below
+ROOK_DIRS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+BISHOP_DIRS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KING_DELTAS = ROOK_DIRS + BISHOP_DIRS
+KNIGHT_DELTAS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+PIECE_VALUE = (1, 5, 3, 3, 9, 0)  # material value of each piece type, the king is never captured
+
+
+def computeMoveOrderKey(index):
+    """
+    Returns the move ordering key of a packed move from its moved piece, captured piece and promotion flag,
+    index = move >> 12 & 0x1FF. Lower keys come first: captures by most valuable victim, then least valuable
+    attacker (MVV-LVA), then quiet promotions, then every other move.
+    """
+    moved, captured, promotion = index & 0xF, index >> 4 & 0xF, index >> 8 & PROMOTION_FLAG
+    if moved >= EMPTY:
+        return 0
+    if captured < EMPTY:
+        return -100 - 10 * PIECE_VALUE[captured % 6] + PIECE_VALUE[moved % 6] - 9 * promotion
+    return -50 if promotion else 0
+
+
+MOVE_ORDER_KEY = [computeMoveOrderKey(index) for index in range(512)]
+
+
+def moveOrderKey(move):
+    """
+    Returns the MOVE_ORDER_KEY of a packed move, the sort key that puts the most promising moves first.
+    """
+    return MOVE_ORDER_KEY[move >> 12 & 0x1FF]
+
+
+def packMove(start, end, moved, captured, flags=0):
+    """
+    Returns the packed int of a move from its fields. The generators and makeMove pack and unpack inline.
+    """
+    return start | end << 6 | moved << 12 | captured << 16 | flags << 20
+
+
+def moveNotation(move):
+    """
+    Returns the chess notation (e.g., 'e2e4') of a packed move, without decoding it into a Move.
+    """
+    return SQ_NAMES[move & 0x3F] + SQ_NAMES[move >> 6 & 0x3F]
+
+
+def computeAttackMask(sq, deltas):
+    """
+    Returns the bitboard of the squares reached from sq by each (row, col) delta that stays on the board.
+    """
+    row, col = sq >> 3, sq & 7
+    mask = 0
+    for dr, dc in deltas:
+        if 0 <= row + dr <= 7 and 0 <= col + dc <= 7:
+            mask |= 1 << ((row + dr) * 8 + col + dc)
+    return mask
+
+
+def computeLineMask(sq, dr, dc):
+    """
+    Returns the bitboard of the line through sq along (dr, dc) in both directions, excluding sq itself.
+    """
+    mask = 0
+    for step in (1, -1):
+        row, col = (sq >> 3) + dr * step, (sq & 7) + dc * step
+        while 0 <= row <= 7 and 0 <= col <= 7:
+            mask |= 1 << (row * 8 + col)
+            row, col = row + dr * step, col + dc * step
+    return mask
+
+
+# Line masks through every square, used for the sliding piece attacks
+RANK_MASK = [computeLineMask(sq, 0, 1) for sq in range(64)]
+FILE_MASK = [computeLineMask(sq, 1, 0) for sq in range(64)]
+DIAG_MASK = [computeLineMask(sq, 1, 1) for sq in range(64)]  # a8-h1 direction
+ANTI_MASK = [computeLineMask(sq, 1, -1) for sq in range(64)]  # h8-a1 direction
+# Every square a rook or bishop on sq could reach on an empty board
+ROOK_LINES = [RANK_MASK[sq] | FILE_MASK[sq] for sq in range(64)]
+BISHOP_LINES = [DIAG_MASK[sq] | ANTI_MASK[sq] for sq in range(64)]
+
+# Zobrist keys: a random 64-bit key per piece and square, XORed together into the position hash.
+# The EMPTY row is all zeros so a non-capture needs no branch, like the bitboard scratch slots
+_zobristRandom = random.Random(2024)
+ZOBRIST = [[_zobristRandom.getrandbits(64) for sq in range(64)] for piece in range(12)] + [[0] * 64]
+ZOBRIST_STM = _zobristRandom.getrandbits(64)  # XORed in when black is to move
+
+# BYTE_REVERSE[b] is the byte b with its bits in reverse order
+BYTE_REVERSE = [int(format(b, "08b")[::-1], 2) for b in range(256)]
+
+
+def reverseBits(x):
+    """
+    Reverses the order of the 64 bits of x, one byte at a time through BYTE_REVERSE.
+    """
+    return (BYTE_REVERSE[x & 0xFF] << 56 | BYTE_REVERSE[x >> 8 & 0xFF] << 48 |
+            BYTE_REVERSE[x >> 16 & 0xFF] << 40 | BYTE_REVERSE[x >> 24 & 0xFF] << 32 |
+            BYTE_REVERSE[x >> 32 & 0xFF] << 24 | BYTE_REVERSE[x >> 40 & 0xFF] << 16 |
+            BYTE_REVERSE[x >> 48 & 0xFF] << 8 | BYTE_REVERSE[x >> 56])
+
+
+def lineAttacks(occupied, sq, mask):
+    """
+    Hyperbola Quintessence: the squares a slider on sq attacks along the line mask, up to and including
+    the first blocker on each side. Subtracting the slider bit from the blockers borrows through every
+    empty square up to the first blocker above the slider, and doing the same on the bit-reversed board
+    covers the squares below it.
+    """
+    o = occupied & mask
+    r = 1 << sq
+    forward = (o - r) & FULL_BOARD
+    reverse = (reverseBits(o) - reverseBits(r)) & FULL_BOARD
+    return (forward ^ reverseBits(reverse)) & mask
+
+
+def rookAttacksHQ(sq, occupied):
+    return lineAttacks(occupied, sq, RANK_MASK[sq]) | lineAttacks(occupied, sq, FILE_MASK[sq])
+
+
+def bishopAttacksHQ(sq, occupied):
+    return lineAttacks(occupied, sq, DIAG_MASK[sq]) | lineAttacks(occupied, sq, ANTI_MASK[sq])
+
+
+# Magic bitboards: the relevant blockers of a slider (its lines minus the board edges) are multiplied by
+# a per square magic number, which maps every blocker subset to a distinct index into a precomputed
+# attack table. The tables are filled at import from the Hyperbola Quintessence attacks above.
+# Set USE_MAGIC_BITBOARDS to False to skip the table setup and use Hyperbola Quintessence directly.
+USE_MAGIC_BITBOARDS = True
+
+ROOK_MAGIC = [
+    0x2080001440022581, 0x1080200040001080, 0x4080100008200080, 0x0280080080100254,
+    0x4D8004000A180080, 0x0100080400020100, 0x1080010040800200, 0x0200004402002081,
+    0x0068800024884004, 0x1000804000802002, 0x000200208A001040, 0x3008801000800800,
+    0x2006001060440A00, 0x1000800200800400, 0x0004000441024810, 0xA001000082004100,
+    0x0040808000204014, 0x0000424002201000, 0x0010110041002000, 0x0000090021041000,
+    0x0204008004800800, 0x0000808004000200, 0x6006040021485042, 0x0000020002409924,
+    0x2000401980028020, 0x4000400100308100, 0x0000820200201041, 0xB100100080800800,
+    0x3004080080040080, 0x0802000200041009, 0x01A0580400021110, 0x00020042000408A1,
+    0x4218884000800023, 0x0480201000400045, 0x0010200080801000, 0x1200200901001000,
+    0x0000100801000500, 0x0080020080800400, 0x004A000100404080, 0x0480005402001081,
+    0x258000402000C000, 0xA010004820084002, 0x0480200010008080, 0x244100100021000C,
+    0x2040080005010010, 0x0012000810020004, 0x0011000200B9000C, 0x1121000080410002,
+    0x00082080410A0600, 0x4002008100402600, 0x0A0300E008544100, 0x7B00080010008080,
+    0x0300080100100500, 0x0002020080040080, 0x0042521810214400, 0x8A00004089140200,
+    0x00001280010A2041, 0x0400401102042086, 0x41902000100C4101, 0x0043020420900009,
+    0x00E2000410082002, 0x4402000108041002, 0x2100101A00814804, 0x0400010400218246
+]
+
+BISHOP_MAGIC = [
+    0x0102040418220020, 0x0108024802002028, 0x8010044040400001, 0x0022209200044800,
+    0x4004504005040114, 0x0022010420A80800, 0x0008441008090002, 0x0000420801480200,
+    0x1100220244011C00, 0x00883004081AB020, 0x4400100152002000, 0x4019080841004000,
+    0x2861021210000000, 0x400EA10108400020, 0x4800208208A24000, 0x0020A500A0842085,
+    0x3410000802504400, 0x0010E0200C010060, 0x0014182042408200, 0x4094006840112109,
+    0x2014200202010000, 0x000100020080C400, 0x800400420D2C0200, 0x0002200182251000,
+    0x0010F10304C41000, 0x001024A008281084, 0x0088110002040100, 0x0820080001004008,
+    0x0104040020410050, 0x0110002027040500, 0x418C008009182100, 0x2C00A9040C80480B,
+    0x008110C8005020A4, 0x4004210802041000, 0x0004020108208100, 0x0000080800120A00,
+    0x430C008400820102, 0x1400808100020108, 0x005006020010A8A0, 0x000801868004A220,
+    0x00420105C00C2000, 0x1010921032019040, 0x0300222028103000, 0x0008004208001080,
+    0x5410202248811400, 0x0008010800800808, 0x3C02C20404000900, 0x0408022282040032,
+    0x0000941002100000, 0x0112209A10100804, 0x080C020111210000, 0x442002A442022008,
+    0x00084A181B040000, 0x00115021021C2080, 0x4010051000A20000, 0x0404688085060000,
+    0x0000220110011000, 0x140000220734200C, 0x0440010424020800, 0x2204828883460800,
+    0x0020000004050410, 0x4060004A20082080, 0x00489034B002C201, 0x0444049010410300
+]
+
+EDGE_FILES = FILE_A | FILE_H
+EDGE_RANKS = 0xFF | 0xFF << 56
+# Only blockers strictly inside the board can change a slider's attacks
+ROOK_MASK = [(RANK_MASK[sq] & ~EDGE_FILES) | (FILE_MASK[sq] & ~EDGE_RANKS) for sq in range(64)]
+BISHOP_MASK = [(DIAG_MASK[sq] | ANTI_MASK[sq]) & ~EDGE_FILES & ~EDGE_RANKS for sq in range(64)]
+ROOK_SHIFT = [64 - bin(mask).count("1") for mask in ROOK_MASK]
+BISHOP_SHIFT = [64 - bin(mask).count("1") for mask in BISHOP_MASK]
+
+
+def computeLineSubsets(sq, line, inner):
+    """
+    Returns every subset of the blockers inner on the line mask through sq (Carry-Rippler), each paired
+    with the squares a slider on sq attacks along that line with those blockers.
+    """
+    subsets = []
+    subset = 0
+    while True:
+        subsets.append((subset, lineAttacks(subset, sq, line)))
+        subset = (subset - inner) & inner
+        if subset == 0:
+            return subsets
+
+
+def computeMagicTable(sq, lines, magic, shift):
+    """
+    Fills the attack table of sq from the two line masks a slider on sq moves along, each paired with the
+    blockers on it that matter. Blockers on one line can't change the attacks along the other, so every
+    subset of the blocker mask is one subset per line, and its attacks the union of their line attacks.
+    """
+    table = [0] * (1 << (64 - shift))
+    (lineA, innerA), (lineB, innerB) = lines
+    subsetsB = computeLineSubsets(sq, lineB, innerB)
+    for subsetA, attacksA in computeLineSubsets(sq, lineA, innerA):
+        for subsetB, attacksB in subsetsB:
+            table[((subsetA | subsetB) * magic & FULL_BOARD) >> shift] = attacksA | attacksB
+    return table
+
+
+def rookAttacksMagic(sq, occupied):
+    return ROOK_TABLE[sq][((occupied & ROOK_MASK[sq]) * ROOK_MAGIC[sq] & FULL_BOARD) >> ROOK_SHIFT[sq]]
+
+
+def bishopAttacksMagic(sq, occupied):
+    return BISHOP_TABLE[sq][((occupied & BISHOP_MASK[sq]) * BISHOP_MAGIC[sq] & FULL_BOARD) >> BISHOP_SHIFT[sq]]
+
+
+if USE_MAGIC_BITBOARDS:
+    ROOK_TABLE = [computeMagicTable(sq, ((RANK_MASK[sq], RANK_MASK[sq] & ~EDGE_FILES),
+                                         (FILE_MASK[sq], FILE_MASK[sq] & ~EDGE_RANKS)),
+                                    ROOK_MAGIC[sq], ROOK_SHIFT[sq])
+                  for sq in range(64)]
+    BISHOP_TABLE = [computeMagicTable(sq, ((DIAG_MASK[sq], DIAG_MASK[sq] & ~EDGE_FILES & ~EDGE_RANKS),
+                                           (ANTI_MASK[sq], ANTI_MASK[sq] & ~EDGE_FILES & ~EDGE_RANKS)),
+                                      BISHOP_MAGIC[sq], BISHOP_SHIFT[sq])
+                    for sq in range(64)]
+    rookAttacks, bishopAttacks = rookAttacksMagic, bishopAttacksMagic
+else:
+    rookAttacks, bishopAttacks = rookAttacksHQ, bishopAttacksHQ
+
+
+def popLsb(bb):
+    """
+    Returns the index of the least significant set bit of bb and bb with that bit cleared.
+    """
+    return (bb & -bb).bit_length() - 1, bb & (bb - 1)
+
+
+# BYTE_SQUARES[row][byte] are the squares of the set bits of byte placed on row
+BYTE_SQUARES = [[tuple(row * 8 + col for col in range(8) if byte >> col & 1) for byte in range(256)]
+                for row in range(8)]
+
+
+def squaresOf(bb):
+    """
+    Returns the squares of all the set bits of bb in ascending order, looked up a row at a time.
+    The generators loop over this instead of popping the bits one call at a time.
+    """
+    squares = ()
+    if bb:
+        # start at the row of the lowest set bit, so the empty rows below it are never visited
+        row = ((bb & -bb).bit_length() - 1) >> 3
+        bb >>= row << 3
+        while bb:
+            squares += BYTE_SQUARES[row][bb & 0xFF]
+            bb >>= 8
+            row += 1
+    return squares
+
+
+# Knight and king attacks from every square, computed once at import
+KNIGHT_ATTACKS = tuple(computeAttackMask(sq, KNIGHT_DELTAS) for sq in range(64))
+KING_ATTACKS = tuple(computeAttackMask(sq, KING_DELTAS) for sq in range(64))
+# The same targets as tuples of squares, already clipped to the board. Walking the few candidates of a
+# knight or king and testing each against a bitboard is cheaper than popping set bits one at a time
+KNIGHT_TARGETS = tuple(tuple(target for target in range(64) if KNIGHT_ATTACKS[sq] >> target & 1) for sq in range(64))
+KING_TARGETS = tuple(tuple(target for target in range(64) if KING_ATTACKS[sq] >> target & 1) for sq in range(64))
+
+
+# Squares a pawn of each color on sq attacks, which are also the squares enemy pawns attack sq from
+PAWN_ATTACKS = [[computeAttackMask(sq, ((-1, -1), (-1, 1))) for sq in range(64)],
+                [computeAttackMask(sq, ((1, -1), (1, 1))) for sq in range(64)]]
+
+
+def computeBetween(a, b):
+    """
+    Returns the bitboard of the squares strictly between a and b if they share a rank, file or diagonal, else 0.
+    """
+    if rookAttacks(a, 0) >> b & 1:
+        return rookAttacks(a, 1 << b) & rookAttacks(b, 1 << a)
+    if bishopAttacks(a, 0) >> b & 1:
+        return bishopAttacks(a, 1 << b) & bishopAttacks(b, 1 << a)
+    return 0
+
+
+BETWEEN = [[computeBetween(a, b) for b in range(64)] for a in range(64)]
+
+
+# The end square and promotion flag of a pawn move onto each square, already packed
+PAWN_END_BITS = tuple(sq << 6 | (PROMOTION_FLAG << 20 if sq < 8 or sq > 55 else 0) for sq in range(64))
+
+
+def genPawnMoves(pawns, enemyOcc, allOcc, white, board, pinLines, targetMask, movesBuf, count):
+    """
+    Generates the moves of every pawn in the pawns bitboard at once by shifting the whole set: single and
+    double pushes onto empty squares and diagonal captures onto enemy pieces. Writes them into movesBuf
+    from index count and returns the new move count.
+    pinLines maps the square of each pinned pawn to the line it may still move along, and only end squares
+    in targetMask are generated.
+    """
+    empty = ~allOcc
+    if white:  # white pawns move towards row 0
+        pawn = PAWN << 12
+        single = pawns >> 8 & empty
+        pushSets = ((single, 8), ((single & RANK_3) >> 8 & empty, 16))
+        captureSets = ((pawns >> 9 & NOT_H & enemyOcc, 9), (pawns >> 7 & NOT_A & enemyOcc, 7))
+    else:
+        pawn = (6 + PAWN) << 12
+        single = pawns << 8 & empty
+        pushSets = ((single, -8), ((single & RANK_6) << 8 & empty, -16))
+        captureSets = ((pawns << 7 & NOT_H & enemyOcc, -7), (pawns << 9 & NOT_A & enemyOcc, -9))
+    # a push always lands on an empty square, so its captured piece is known without looking at the board
+    pushBits = pawn | EMPTY << 16
+    for targets, offset in pushSets:
+        for end_sq in squaresOf(targets & targetMask):
+            sq = end_sq + offset  # the pawn's start square
+            if pinLines:
+                pinLine = pinLines.get(sq)
+                if pinLine is not None and not pinLine >> end_sq & 1:
+                    continue
+            movesBuf[count] = sq | PAWN_END_BITS[end_sq] | pushBits
+            count += 1
+    for targets, offset in captureSets:
+        for end_sq in squaresOf(targets & targetMask):
+            sq = end_sq + offset
+            if pinLines:
+                pinLine = pinLines.get(sq)
+                if pinLine is not None and not pinLine >> end_sq & 1:
+                    continue
+            movesBuf[count] = sq | PAWN_END_BITS[end_sq] | pawn | board[end_sq] << 16
+            count += 1
+    return count
+
+
+def genKnightMoves(knights, piece, ownOcc, board, pinLines, targetMask, movesBuf, count):
+    """
+    Generates the moves of every knight in the knights bitboard onto the squares of targetMask, writes them
+    into movesBuf from index count and returns the new move count. piece is the knights' PIECE_NAMES index.
+    """
+    for sq in pinLines:  # a pinned knight can never move
+        knights &= ~(1 << sq)
+    # every knight target that is not occupied by an ally piece, the same for all the knights
+    targets = ~ownOcc & targetMask
+    for sq in squaresOf(knights):
+        for end_sq in KNIGHT_TARGETS[sq]:
+            if targets >> end_sq & 1:
+                movesBuf[count] = sq | end_sq << 6 | piece << 12 | board[end_sq] << 16
+                count += 1
+    return count
+
+
+def genSliderMoves(sliders, attacks, ownOcc, allOcc, board, pinLines, targetMask, movesBuf, count):
+    """
+    Generates the moves of every slider in the sliders bitboard along the lines of the attacks function
+    (rookAttacks or bishopAttacks) onto the squares of targetMask, writes them into movesBuf
+    from index count and returns the new move count. The sliders may be of different types, like rooks and
+    queens moving along the ranks and files, since each one's piece is read off the board.
+    """
+    movable = ~ownOcc & targetMask  # every square but the ally pieces, the same for all the sliders
+    for sq in squaresOf(sliders):
+        # attacked squares up to the first blocker in every direction
+        targets = attacks(sq, allOcc) & movable
+        pinLine = pinLines.get(sq)
+        if pinLine is not None:  # a pinned piece may only move along the pin line
+            targets &= pinLine
+        start = sq | board[sq] << 12
+        for end_sq in squaresOf(targets):
+            movesBuf[count] = start | end_sq << 6 | board[end_sq] << 16
+            count += 1
+    return count
+
+
+def squareAttacked(bb, sq, color, occupied):
+    """
+    Returns whether any piece of color in the piece bitboards bb attacks sq, with sliders blocked by occupied.
+    Looks outwards from sq for each kind of attacker instead of generating the attacker's moves, and only
+    looks up the slider attacks if a slider stands somewhere on the lines through sq.
+    """
+    base = color * 6
+    if (KNIGHT_ATTACKS[sq] & bb[base + KNIGHT] or
+            PAWN_ATTACKS[1 - color][sq] & bb[base + PAWN] or
+            KING_ATTACKS[sq] & bb[base + KING]):
+        return True
+    queens = bb[base + QUEEN]
+    rooks = (bb[base + ROOK] | queens) & ROOK_LINES[sq]
+    if rooks and rookAttacks(sq, occupied) & rooks:
+        return True
+    bishops = (bb[base + BISHOP] | queens) & BISHOP_LINES[sq]
+    return bool(bishops and bishopAttacks(sq, occupied) & bishops)
+
+
+def genKingMoves(sq, piece, ownOcc, enemy, allOcc, board, bb, movesBuf, count):
+    """
+    Generates the moves of the king on sq onto every square that is neither an ally piece nor attacked by the
+    enemy color, writes them into movesBuf from index count and returns the new move count. bb are the
+    piece bitboards of the position.
+    """
+    # take the king off the board, so squares behind it along a checking line count as attacked
+    occupied = allOcc ^ 1 << sq
+    for end_sq in KING_TARGETS[sq]:
+        if ownOcc >> end_sq & 1:
+            continue
+        if not squareAttacked(bb, end_sq, enemy, occupied):
+            movesBuf[count] = sq | end_sq << 6 | piece << 12 | board[end_sq] << 16
+            count += 1
+    return count
 
 
 class GameState:
+    # Fixed attribute slots instead of a per-instance __dict__
+    __slots__ = ("board", "bb", "occ", "allOcc", "whiteToMove", "zobristKey", "moveLog", "zobristLog", "movesBuf",
+                 "inCheck", "pinLines", "pinCache", "movesCache", "ttKeys", "ttData", "killers", "history",
+                 "rootMove", "checkMate", "staleMate")
+
     def __init__(self):
-        # The board is an 8x8 2D list
+        # The starting position as an 8x8 2D list
         # First character represents the color of the piece: 'w' for white, 'b' for black
         # Second character represents the type of the piece: 'R', 'N', 'B', 'Q', 'K', 'p'
         # "--" represents an empty tile
-        self.board = [
+        layout = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
             ["--", "--", "--", "--", "--", "--", "--", "--"],
@@ -20,435 +469,557 @@ class GameState:
             ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
         ]
+        # The board is a flat 64 byte array indexed by square (row * 8 + col) holding the PIECE_NAMES index
+        # of each piece, EMPTY for an empty tile. The color of a piece is piece // 6 and its type piece % 6
+        self.board = bytearray(PIECE_INDEX[name] for row in layout for name in row)
 
-        # A dictionary to map each piece type to its corresponding move function
-        self.moveFunctions = {
-            'p': self.getPawnMoves,
-            'R': self.getRookMoves,
-            'N': self.getKnightMoves,
-            'B': self.getBishopMoves,
-            'Q': self.getQueenMoves,
-            'K': self.getKingMoves
-        }
+        # One 64-bit bitboard per piece type and color, square index is row * 8 + col (a8 = 0, h1 = 63)
+        # The bitboards and occupancies are fixed size unsigned 64-bit arrays, so they can't grow or take a
+        # value that doesn't fit a bitboard
+        # self.board is kept alongside as a square -> piece lookup
+        # self.bb[EMPTY] and self.occ[2] (EMPTY // 6) are scratch slots that take the capture xors of
+        # a non-capturing move, so makeMove and undoMove need no capture branch
+        self.bb = array("Q", [0]) * 13
+        for sq in range(64):
+            if self.board[sq] != EMPTY:
+                self.bb[self.board[sq]] |= 1 << sq
+        # Occupancy of all white and all black pieces, and of every piece
+        self.occ = array("Q", [0]) * 3
+        for i in range(12):
+            self.occ[i // 6] |= self.bb[i]
+        self.allOcc = self.occ[WHITE] | self.occ[BLACK]
 
         # White moves first
         self.whiteToMove = True
+        # Zobrist hash of the position, updated incrementally by makeMove and undoMove
+        self.zobristKey = self.computeZobristKey()
 
-        # A list to keep track of the moves made, allowing for undo functionality
-        self.moveLog = []
+        # The packed moves made, allowing for undo functionality. The unsigned 64-bit array stores plain ints
+        # instead of a list of references, with room in the high bits for any state a move has to restore
+        self.moveLog = array("Q")
+        # The Zobrist key before each move of the move log, so undoMove restores it instead of recomputing it,
+        # and the hashes of every earlier position are at hand
+        self.zobristLog = array("Q")
+        # Scratch buffer getValidMoves generates into
+        self.movesBuf = array("I", [0]) * MAX_MOVES
 
-        # Track the king's position for both players, important for check conditions
-        self.whiteKingLocation = (7, 4)
-        self.blackKingLocation = (0, 4)
         self.inCheck = False
-        self.pins = []
-        self.checks = []
+        self.pinLines = {}  # square of each pinned ally piece -> the squares it may still move to
+        self.pinCache = {}  # Zobrist key -> getCheckersAndPins result of that position
+        self.movesCache = {}  # Zobrist key -> array of the valid moves of that position
+        # The transposition table, see TT_SIZE. Its 4MB are allocated by the first ttStore, so a GameState that
+        # only plays moves never pays for them
+        self.ttKeys = None
+        self.ttData = None
+        # Move ordering state of the search: the two latest quiet moves that caused a cutoff at each ply,
+        # and how often each from/to pair (move & 0xFFF) caused one, weighted by depth
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = array("Q", [0]) * 4096
+        self.rootMove = 0  # the best move alphaBeta found at the root of its last search
         self.checkMate = False
         self.staleMate = False
 
+    """
+    The (row, col) of each king, read off the king bitboards so moves never have to keep them up to date.
+    """
+
+    @property
+    def whiteKingLocation(self):
+        sq = self.bb[KING].bit_length() - 1
+        return sq >> 3, sq & 7
+
+    @property
+    def blackKingLocation(self):
+        sq = self.bb[6 + KING].bit_length() - 1
+        return sq >> 3, sq & 7
+
 
     """
-    Takes a move as a parameter and executes it.
-    Updates the board, logs the move, and switches the turn.
-    This implementation does not handle castling, en passant, or promotion.
+    Takes a packed move as a parameter and executes it.
+    Updates the board, the piece bitboards and occupancies and the Zobrist key, logs the move, and switches the turn.
+    Pawns promote to queens. This implementation does not handle castling or en passant.
     """
 
     def makeMove(self, move):
+        start = move & 0x3F
+        end = move >> 6 & 0x3F
+        moved = move >> 12 & 0xF
+        captured = move >> 16 & 0xF
+        board = self.board
+        bb = self.bb
+        occ = self.occ
+
         # Move the piece to the new location
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        board[start] = EMPTY
+        board[end] = moved
+
+        # Update the bitboards: xor the moved piece off its start square and onto its end square,
+        # and the captured piece (or the EMPTY scratch slot) off the end square
+        color = moved // 6
+        startBit = 1 << start
+        endBit = 1 << end
+        bb[moved] ^= startBit | endBit
+        occ[color] ^= startBit | endBit
+        bb[captured] ^= endBit
+        occ[captured // 6] ^= endBit
+        self.allOcc = occ[WHITE] | occ[BLACK]
 
         # Log the move so it can be undone later
+        key = self.zobristKey
         self.moveLog.append(move)
+        self.zobristLog.append(key)
+        key ^= ZOBRIST[moved][start] ^ ZOBRIST[moved][end] ^ ZOBRIST[captured][end] ^ ZOBRIST_STM
 
         # Swap players: white to move -> black to move, and vice versa
         self.whiteToMove = not self.whiteToMove
 
-        # Update king's location if moved
-        if move.pieceMoved == 'wK':
-            self.whiteKingLocation = (move.endRow, move.endCol)
-        elif move.pieceMoved == 'bK':
-            self.blackKingLocation = (move.endRow, move.endCol)
-
         #pawn promotion
-        if move.isPawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + 'Q'
+        if move >> 20 & PROMOTION_FLAG:
+            board[end] = color * 6 + QUEEN
+            bb[moved] ^= endBit
+            bb[color * 6 + QUEEN] ^= endBit
+            key ^= ZOBRIST[moved][end] ^ ZOBRIST[color * 6 + QUEEN][end]
+        self.zobristKey = key
 
 
     """
     Undo the last move made. This method pops the last move from the move log and reverts the board to the previous state.
+    The bitboard xors of makeMove are applied again, and the Zobrist key is popped from its log.
     """
 
     def undoMove(self):
-        if len(self.moveLog) != 0:  # Ensure there is a move to undo
+        if self.moveLog:  # Ensure there is a move to undo
             move = self.moveLog.pop()
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            start = move & 0x3F
+            end = move >> 6 & 0x3F
+            moved = move >> 12 & 0xF
+            captured = move >> 16 & 0xF
+            board = self.board
+            bb = self.bb
+            occ = self.occ
+            board[start] = moved
+            board[end] = captured
             self.whiteToMove = not self.whiteToMove  # Switch turns back
 
-            # Update king's position back to the original if the king was moved
-            if move.pieceMoved == 'wK':
-                self.whiteKingLocation = (move.startRow, move.startCol)
-            elif move.pieceMoved == 'bK':
-                self.blackKingLocation = (move.startRow, move.startCol)
+            # Mirror the bitboard xors done in makeMove
+            color = moved // 6
+            startBit = 1 << start
+            endBit = 1 << end
+            if move >> 20 & PROMOTION_FLAG:
+                bb[moved] ^= endBit
+                bb[color * 6 + QUEEN] ^= endBit
+            bb[moved] ^= startBit | endBit
+            occ[color] ^= startBit | endBit
+            bb[captured] ^= endBit
+            occ[captured // 6] ^= endBit
+            self.allOcc = occ[WHITE] | occ[BLACK]
+            self.zobristKey = self.zobristLog.pop()
 
     """
-    Generate all valid moves for the current player, considering checks.
+    Returns the moves played so far as Move objects, decoded from the packed move log on demand for display.
+    """
+
+    def getMoveHistory(self):
+        return [Move.fromInt(move) for move in self.moveLog]
+
+    """
+    Compute the Zobrist hash of the current position from scratch.
+    """
+
+    def computeZobristKey(self):
+        key = 0 if self.whiteToMove else ZOBRIST_STM
+        for piece in range(12):
+            pieces = self.bb[piece]
+            while pieces:
+                sq, pieces = popLsb(pieces)
+                key ^= ZOBRIST[piece][sq]
+        return key
+
+    """
+    Generate all valid moves for the current player, considering checks, as a new list of packed moves.
+    The moves of positions seen before, like after an undo, come from a cache keyed by the Zobrist key.
     """
 
     def getValidMoves(self):
-        moves = []
-        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
-        if self.whiteToMove:
-            kingRow = self.whiteKingLocation[0]
-            kingCol = self.whiteKingLocation[1]
+        movesCache = self.movesCache
+        key = self.zobristKey
+        moves = movesCache.get(key)
+        if moves is None:
+            count = self.generateValidMoves(self.movesBuf)
+            moves = self.movesBuf[:count]
+            if len(movesCache) >= MOVES_CACHE_SIZE:  # start over rather than grow without bound
+                movesCache.clear()
+            movesCache[key] = moves
         else:
-            kingRow = self.blackKingLocation[0]
-            kingCol = self.blackKingLocation[1]
-        if self.inCheck:
-            if len(self.checks) == 1:  #only 1 check, block check or move king
-                moves = self.getAllPossibleMoves()
-                #To block a check you must move a piece into one of the squares between the enemy and the kind
-                check = self.checks[0]  #Check Information
-                checkRow = check[0]
-                checkCol = check[1]
-                pieceChecking = self.board[checkRow][checkCol]  #enemy piece causing check
-                validSquares = []  #Squares that piece can move to
-
-                #if knight must capture knight or move king
-                if pieceChecking[1] == "N":
-                    validSquares = [(checkRow, checkCol)]
-                else:
-                    for i in range(1, 8):
-                        validSquare = (
-                        kingRow + check[2] * i, kingCol + check[3] * i)  #check[2] and check[3] are the check directions
-                        validSquares.append(validSquare)
-                        if validSquare[0] == checkRow and validSquare[1] == checkCol:  #oce you get to piece and checks
-                            break
-                #get rid of any moves that don't block check or move king
-                for i in range(len(moves) - 1, -1,
-                               -1):  #go through backwards when you are removing from a list as iterating
-                    if moves[i].pieceMoved[1] != "K":  #move doesn't move king so it must block or capture
-                        if not (moves[i].endRow,
-                                moves[i].endCol) in validSquares:  #move doesn't block check or capture piece
-                            moves.remove(moves[i])
-
-            else:  #double check, king has to move
-                self.getKingMoves(kingRow, kingCol, moves)
-        else:  #not in check so all moves are fine
-            moves = self.getAllPossibleMoves()
+            # restore the state generateValidMoves would have left behind
+            checkers, self.pinLines = self.getCheckersAndPins()
+            self.inCheck = checkers != 0
+            self.checkMate = not moves and self.inCheck
+            self.staleMate = not moves and not self.inCheck
+        return moves.tolist()
+
+    """
+    Generate all valid moves for the current player like getValidMoves, with the most promising moves first
+    so a search prunes more: captures ordered by MVV-LVA, then promotions, then quiet moves.
+    """
 
+    def getOrderedMoves(self):
+        moves = self.getValidMoves()
+        moves.sort(key=moveOrderKey)
         return moves
-        # # 1. Generate all possible moves without considering checks
-        # moves = self.getAllPossibleMoves()
-        # # 2. Iterate through each move and simulate the move
-        # for i in range(len(moves) - 1, -1, -1):  # Iterate backward when removing from the list
-        #     self.makeMove(moves[i])
-        #     # 3. Generate all opponent's moves and check if any attacks the current player's king
-        #     # 4. Undo the move (to revert back to original state)
-        #     self.whiteToMove = not self.whiteToMove
-        #     if self.inCheck():
-        #         moves.remove(moves[i])# 5. If the move leaves the king in check, it's not a valid move
-        #     self.whiteToMove = not self.whiteToMove
-        #     self.undoMove()
-        #
-        # if len(moves) == 0:# either checkmate or stalemate
-        #     if self.inCheck():
-        #         self.checkMate = True
-        #     else:
-        #         self.staleMate = True
-        # else:
-        #     self.checkMate = False
-        #     self.staleMate = False
-        # return moves
+
+    """
+    Write all valid moves for the current player into movesBuf and return how many there are.
+    Nothing is allocated, so search code can keep one buffer per ply and reuse it.
+    """
+
+    def generateValidMoves(self, movesBuf):
+        checkers, self.pinLines = self.getCheckersAndPins()
+        self.inCheck = checkers != 0
+        kingSq = self.bb[KING if self.whiteToMove else 6 + KING].bit_length() - 1
+        if checkers & (checkers - 1):  #double check, king has to move
+            count = self.getKingMoves(kingSq, movesBuf, 0)
+        elif checkers:  #only 1 check, block check, capture the checking piece or move king
+            checkSq = checkers.bit_length() - 1
+            count = self.getAllPossibleMoves(movesBuf, 0, checkers | BETWEEN[kingSq][checkSq])
+        else:  #not in check so all moves are fine
+            count = self.getAllPossibleMoves(movesBuf)
+
+        #no moves is either checkmate or stalemate
+        self.checkMate = count == 0 and self.inCheck
+        self.staleMate = count == 0 and not self.inCheck
+        return count
+
+    """
+    Look up the current position in the transposition table.
+    Returns the (depth, value, flag, move) stored for it, or None if its slot holds another position
+    or nothing was stored yet.
+    """
+
+    def ttProbe(self):
+        ttKeys = self.ttKeys
+        if ttKeys is None:
+            return None
+        key = self.zobristKey
+        index = key & (TT_SIZE - 1)
+        if ttKeys[index] != key:
+            return None
+        data = self.ttData[index]
+        return data >> 26 & TT_MAX_DEPTH, (data >> 32) - TT_VALUE_OFFSET, data >> 24 & 3, data & 0xFFFFFF
+
+    """
+    Store the value of the current position searched to depth in the transposition table, with the flag telling
+    what kind of value it is and the best move found (0 for none). An entry of the same position searched deeper
+    is kept, unless one of the two is a perft count and the other a search value, which never stand in for each
+    other. Any other entry in the slot is replaced. The table is allocated on the first store.
+    """
+
+    def ttStore(self, depth, value, flag, move=0):
+        if self.ttKeys is None:
+            self.ttKeys = array("Q", [0]) * TT_SIZE
+            self.ttData = array("Q", [0]) * TT_SIZE
+        key = self.zobristKey
+        index = key & (TT_SIZE - 1)
+        if self.ttKeys[index] == key:
+            data = self.ttData[index]
+            if data >> 26 & TT_MAX_DEPTH > depth and (data >> 24 & 3 == TT_PERFT) == (flag == TT_PERFT):
+                return
+        self.ttKeys[index] = key
+        self.ttData[index] = (value + TT_VALUE_OFFSET) << 32 | depth << 26 | flag << 24 | move
+
+    """
+    Count the leaf positions of the valid move tree to the given depth, to check and time move generation.
+    Uses one preallocated moves buffer per ply.
+    With hashed set, subtree counts are stored in the transposition table and positions reached again by
+    another move order aren't counted twice.
+    """
+
+    def perft(self, depth, buffers=None, hashed=False):
+        if depth == 0:
+            return 1
+        if buffers is None:
+            buffers = [array("I", [0]) * MAX_MOVES for _ in range(depth)]
+        if hashed and depth > 1:
+            entry = self.ttProbe()
+            if entry is not None and entry[0] == depth and entry[2] == TT_PERFT:
+                return entry[1]
+        movesBuf = buffers[depth - 1]
+        count = self.generateValidMoves(movesBuf)
+        if depth == 1:
+            return count
+        nodes = 0
+        makeMove, undoMove, perft = self.makeMove, self.undoMove, self.perft
+        for i in range(count):
+            makeMove(movesBuf[i])
+            nodes += perft(depth - 1, buffers, hashed)
+            undoMove()
+        if hashed and depth <= TT_MAX_DEPTH and nodes < TT_VALUE_OFFSET:
+            self.ttStore(depth, nodes, TT_PERFT)
+        return nodes
+
+    """
+    Score the current position statically: the material balance in PIECE_VALUE units,
+    positive when the side to move is ahead.
+    """
+
+    def evaluate(self):
+        bb = self.bb
+        score = 0
+        for piece in range(KING):
+            score += PIECE_VALUE[piece] * (bin(bb[piece]).count("1") - bin(bb[6 + piece]).count("1"))
+        return score if self.whiteToMove else -score
+
+    """
+    Search the best move of the current position with iterative deepening: alpha-beta searches to depth 1, 2, ...
+    up to depth (at least 1, at most TT_MAX_DEPTH), each one ordering its moves by what the shallower ones stored
+    in the transposition table, killers and history.
+    Returns the best move (0 if there are no valid moves) and its score.
+    """
+
+    def search(self, depth):
+        # at least one iteration so there is a move to return, and deeper would not fit the depth bits of an entry
+        depth = max(1, min(depth, TT_MAX_DEPTH))
+        buffers = [array("I", [0]) * MAX_MOVES for _ in range(MAX_PLY)]
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        history = self.history
+        for i in range(4096):  # age the history of earlier searches, so it adapts to the new position
+            history[i] >>= 1
+        bestMove, value = 0, 0
+        for d in range(1, depth + 1):
+            value = self.alphaBeta(d, -MATE_VALUE, MATE_VALUE, 0, buffers)
+            bestMove = self.rootMove
+        # leave the check, pin and mate state of the root position, like getValidMoves does
+        self.generateValidMoves(self.movesBuf)
+        return bestMove, value
+
+    """
+    Negamax alpha-beta search of the current position to depth, ply moves below the root, with fail-soft scores.
+    The moves are tried in this order: the transposition table move, captures and promotions by MVV-LVA,
+    the two killer moves of the ply, then quiet moves by history. Quiet moves that cause a cutoff become
+    killers and add to the history of their from/to squares. At the root (ply 0) the best move is left in rootMove.
+    """
+
+    def alphaBeta(self, depth, alpha, beta, ply, buffers):
+        if depth == 0:
+            return self.quiescence(alpha, beta, ply, buffers)
+        ttMove = 0
+        entry = self.ttProbe()
+        if entry is not None and entry[2] != TT_PERFT:
+            entryDepth, value, flag, ttMove = entry
+            if ply and entryDepth >= depth:  # the root always searches, so it always has a best move
+                # mates are stored relative to the position, see below
+                if value > MATE_BOUND:
+                    value -= ply
+                elif value < -MATE_BOUND:
+                    value += ply
+                if flag == TT_EXACT or (flag == TT_LOWER and value >= beta) or (flag == TT_UPPER and value <= alpha):
+                    return value
+        movesBuf = buffers[ply]
+        count = self.generateValidMoves(movesBuf)
+        if count == 0:
+            if not ply:
+                self.rootMove = 0
+            return -MATE_VALUE + ply if self.inCheck else 0
+
+        killers = self.killers[ply]
+        killer1, killer2 = killers
+        history = self.history
+
+        def orderKey(move):
+            if move == ttMove:
+                return -1 << 62
+            key = MOVE_ORDER_KEY[move >> 12 & 0x1FF]
+            if key:  # captures and promotions, ahead of every quiet move
+                return key << 40
+            if move == killer1:
+                return -2 << 32
+            if move == killer2:
+                return -1 << 32
+            return -history[move & 0xFFF]
+
+        alphaOrig = alpha
+        bestValue = -MATE_VALUE
+        bestMove = 0
+        makeMove, undoMove, alphaBeta = self.makeMove, self.undoMove, self.alphaBeta
+        for move in sorted(movesBuf[:count], key=orderKey):
+            makeMove(move)
+            value = -alphaBeta(depth - 1, -beta, -alpha, ply + 1, buffers)
+            undoMove()
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+                if value > alpha:
+                    alpha = value
+                    if value >= beta:
+                        if not MOVE_ORDER_KEY[move >> 12 & 0x1FF]:  # a quiet move
+                            if move != killers[0]:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            history[move & 0xFFF] += depth * depth
+                        break
+
+        if bestValue >= beta:
+            flag = TT_LOWER
+        elif bestValue > alphaOrig:
+            flag = TT_EXACT
+        else:
+            flag = TT_UPPER
+        # store mates as plies from this position rather than from the root, so they hold wherever it is reached
+        if bestValue > MATE_BOUND:
+            self.ttStore(depth, bestValue + ply, flag, bestMove)
+        elif bestValue < -MATE_BOUND:
+            self.ttStore(depth, bestValue - ply, flag, bestMove)
+        else:
+            self.ttStore(depth, bestValue, flag, bestMove)
+        if not ply:
+            self.rootMove = bestMove
+        return bestValue
+
+    """
+    Search only the captures and promotions of the current position, until it is quiet, so alphaBeta never
+    scores a position in the middle of an exchange. The side to move may also stand pat on the static evaluation,
+    unless it is in check: then every evasion is searched, as the quiet ones may be the only way out.
+    """
+
+    def quiescence(self, alpha, beta, ply, buffers):
+        if ply == MAX_PLY:  # out of buffers, only reachable through a long run of checks
+            return self.evaluate()
+        movesBuf = buffers[ply]
+        count = self.generateValidMoves(movesBuf)
+        if count == 0:
+            return -MATE_VALUE + ply if self.inCheck else 0
+        if self.inCheck:
+            bestValue = -MATE_VALUE
+            moves = movesBuf[:count].tolist()
+        else:
+            bestValue = self.evaluate()
+            if bestValue >= beta:
+                return bestValue
+            if bestValue > alpha:
+                alpha = bestValue
+            # only captures and promotions have a nonzero MOVE_ORDER_KEY
+            moves = [move for move in movesBuf[:count] if MOVE_ORDER_KEY[move >> 12 & 0x1FF]]
+        moves.sort(key=moveOrderKey)
+        makeMove, undoMove, quiescence = self.makeMove, self.undoMove, self.quiescence
+        for move in moves:
+            makeMove(move)
+            value = -quiescence(-beta, -alpha, ply + 1, buffers)
+            undoMove()
+            if value > bestValue:
+                bestValue = value
+                if value > alpha:
+                    alpha = value
+                    if value >= beta:
+                        break
+        return bestValue
 
     """
     Determine if the current player's king is in check.
+    The inCheck attribute holds the same answer for the position of the last move generation.
     """
 
-    def inCheck(self):
+    def kingInCheck(self):
         if self.whiteToMove:
-            return self.squareUnderAttack(self.whiteKingLocation[0], self.whiteKingLocation[1])
+            return self.isAttacked(self.bb[KING].bit_length() - 1, BLACK, self.allOcc)
         else:
-            return self.squareUnderAttack(self.blackKingLocation[0], self.blackKingLocation[1])
+            return self.isAttacked(self.bb[6 + KING].bit_length() - 1, WHITE, self.allOcc)
 
     """ 
     Determine if enemy can attack the square r, c
     """
 
     def squareUnderAttack(self, r, c):
-        self.whiteToMove = not self.whiteToMove  # switch to opponent's move
-        oppMoves = self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove  # switch turns back
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:  # square is under attack
-                return True
-        return False
+        return self.isAttacked(r * 8 + c, BLACK if self.whiteToMove else WHITE, self.allOcc)
 
     """
-    Generate all possible moves for the current player without considering checks.
+    Determine if any piece of color attacks sq, with sliders blocked by occupied.
     """
 
-    def getAllPossibleMoves(self):
-        moves = []
-        for r in range(len(self.board)):  # number of rows
-            for c in range(len(self.board[r])):  # number of columns in given row
-                piece = self.board[r][c]
-                if piece != "--":  # Skip empty squares
-                    turn = piece[0]
-                    if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
-                        pieceType = piece[1]
-                        self.moveFunctions[pieceType](r, c,
-                                                      moves)  # Calls the appropriate move function based on piece type
-        return moves
+    def isAttacked(self, sq, color, occupied):
+        return squareAttacked(self.bb, sq, color, occupied)
 
-    '''
-    Returns if the player is in check, a list of pins and a list of checks
-    '''
+    """
+    Generate all possible moves for the current player without considering checks.
+    Writes them into movesBuf from index count and returns the new move count.
+    Only moves onto targetMask are generated, except for the king's.
+    """
 
-    def checkForPinsAndChecks(self):
-        pins = []  #squares where the allied pinned piece is and direction pinned from
-        checks = []  #squares where enemy is applying a check
-        inCheck = False
-        if self.whiteToMove:
-            enemyColor = "b"
-            allyColor = "w"
-            startRow = self.whiteKingLocation[0]
-            startCol = self.whiteKingLocation[1]
-        else:
-            enemyColor = "w"
-            allyColor = "b"
-            startRow = self.blackKingLocation[0]
-            startCol = self.blackKingLocation[1]
-
-        #Check outward from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            d = directions[j]
-            possiblePin = ()  #reset possible pins
-            for i in range(1, 8):
-                endRow = startRow + d[0] * i
-                endCol = startCol + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] == allyColor:
-                        if possiblePin == ():  #1st allied piece could be pinned
-                            possiblePin = (endRow, endCol, d[0], d[1])
-                        else:  #2nd allied piece, so no pin or check possible in this direction
-                            break
-                    elif endPiece[0] == enemyColor:
-                        type = endPiece[1]
-                        #5 possibilities in this complex conditional
-                        #1.) orthogonally away from king and piece is a rook
-                        #2.) diagonally away from king and piece is a bishop
-                        #3.) 1 square away diagonally from king and piece is pawn
-                        #4.) any direction and piece is queen
-                        #5.) any direction 1 square away and piece is a king( this is necessary to prevent a kinf move to square controlled by another king)
-                        if (0 <= j <= 3 and type == "R") or \
-                                (4 <= j <= 7 and type == "B") or \
-                                (i == 1 and type == "p" and (
-                                        (enemyColor == "w" and 6 <= j <= 7) or (enemyColor == "b" and 4 <= j <= 5))) or \
-                                (type == "Q") or (i == 1 and type == "K"):
-                            if possiblePin == ():  #No piece blocking, so check
-                                inCheck = True
-                                checks.append((endRow, endCol, d[0], d[1]))
-                                break
-                            else:  #piece blocking so pin
-                                pins.append(possiblePin)
-                        else:  #enemy piece not applying check
-                            break
-
-                else:
-                    break  #off board
-        # check for knight checks
-        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for m in knightMoves:
-            endRow = startRow + m[0]
-            endCol = startCol + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] == enemyColor and endPiece[1] == "N":  # enemy knight attacking king
-                    inCheck = True
-                    checks.append((endRow, endCol, m[0], m[1]))
-        return inCheck, pins, checks
-
-    """
-    Get all the valid pawn moves for the pawn located at row, col. and add these moves to the list.
-    Handles basic pawn movement and captures.
-    """
-
-    def getPawnMoves(self, row, col, moves):
-        '''
-        Get all the pawn moves for the pawn located at row, col and add the moves to the list.
-        '''
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-
-        if self.whiteToMove:  # white pawn moves
-            if self.board[row - 1][col] == "--":  # 1 square pawn advance
-                if not piece_pinned or pin_direction == (-1, 0):
-                    moves.append(Move((row, col), (row - 1, col), self.board))  # (start square, end square, board)
-                    if row == 6 and self.board[row - 2][col] == "--":  # 2 square pawn advance
-                        moves.append(Move((row, col), (row - 2, col), self.board))
-
-            if col - 1 >= 0:  # capturing to the left - impossible if a pawn is standing in a far left column
-                if self.board[row - 1][col - 1][0] == "b":  # enemy piece to capture
-                    if not piece_pinned or pin_direction == (-1, -1):
-                        moves.append(Move((row, col), (row - 1, col - 1), self.board))
-
-            if col + 1 <= 7:  # capturing to the right - analogical
-                if self.board[row - 1][col + 1][0] == "b":  # enemy piece to capture
-                    if not piece_pinned or pin_direction == (-1, 1):
-                        moves.append(Move((row, col), (row - 1, col + 1), self.board))
-
-        else:  # black pawn moves
-            if self.board[row + 1][col] == "--":  # 1 square pawn advance
-                if not piece_pinned or pin_direction == (1, 0):
-                    moves.append(Move((row, col), (row + 1, col), self.board))
-                    if row == 1 and self.board[row + 2][col] == "--":
-                        moves.append(Move((row, col), (row + 2, col), self.board))
-
-            if col - 1 >= 0:
-                if self.board[row + 1][col - 1][0] == "w":
-                    if not piece_pinned or pin_direction == (1, -1):
-                        moves.append(Move((row, col), (row + 1, col - 1), self.board))
-
-            if col + 1 <= 7:
-                if self.board[row + 1][col + 1][0] == "w":
-                    if not piece_pinned or pin_direction == (1, 1):
-                        moves.append(Move((row, col), (row + 1, col + 1), self.board))
-
-    def getRookMoves(self, row, col, moves):
-        '''
-        Get all the rook moves for the rook located at row, col and add the moves to the list.
-        '''
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[row][col][
-                    1] != "Q":  # can't remove queen from pin on rook moves, only remove it on bishop moves
-                    self.pins.remove(self.pins[i])
-                break
-
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
-        enemy_color = "b" if self.whiteToMove else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check for possible moves only in boundaries of the board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
-                    break
-
-    def getKnightMoves(self, row, col, moves):
-        '''
-        Get all the knight moves for the knight located at row col and add the moves to the list.
-        '''
-        piece_pinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
-
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2),
-                        (1, -2))  # up/left up/right right/up right/down down/left down/right left/up left/down
-        ally_color = "w" if self.whiteToMove else "b"
-        for move in knight_moves:
-            end_row = row + move[0]
-            end_col = col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                if not piece_pinned:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] != ally_color:  # so it's either enemy piece or empty square
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-
-    def getBishopMoves(self, row, col, moves):
+    def getAllPossibleMoves(self, movesBuf, count=0, targetMask=FULL_BOARD):
+        white = self.whiteToMove
+        color = WHITE if white else BLACK
+        base = color * 6
+        bb = self.bb
+        ownOcc = self.occ[color]
+        allOcc = self.allOcc
+        board = self.board
+        pinLines = self.pinLines
+        # each piece type is generated for the whole bitboard at once by the module level generators,
+        # and piece types the side has none of left are skipped
+        if bb[base + PAWN]:
+            count = genPawnMoves(bb[base + PAWN], self.occ[1 - color], allOcc, white, board, pinLines,
+                                 targetMask, movesBuf, count)
+        # the queens are generated with the rooks along the ranks and files and with the bishops along the diagonals
+        queens = bb[base + QUEEN]
+        rooks = bb[base + ROOK] | queens
+        if rooks:
+            count = genSliderMoves(rooks, rookAttacks, ownOcc, allOcc, board, pinLines, targetMask, movesBuf, count)
+        if bb[base + KNIGHT]:
+            count = genKnightMoves(bb[base + KNIGHT], base + KNIGHT, ownOcc, board, pinLines, targetMask, movesBuf,
+                                   count)
+        bishops = bb[base + BISHOP] | queens
+        if bishops:
+            count = genSliderMoves(bishops, bishopAttacks, ownOcc, allOcc, board, pinLines, targetMask, movesBuf,
+                                   count)
+        return genKingMoves(bb[base + KING].bit_length() - 1, base + KING, ownOcc, 1 - color, allOcc, board, bb,
+                            movesBuf, count)
 
-        '''
-        Get all the bishop moves for the bishop located at row col and add the moves to the list.
-        '''
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
-
-        directions = ((-1, -1), (-1, 1), (1, 1), (1, -1))  # diagonals: up/left up/right down/right down/left
-        enemy_color = "b" if self.whiteToMove else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check if the move is on board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
-                    break
-
-    def getQueenMoves(self, row, col, moves):
-        '''
-        Get all the queen moves for the queen located at row col and add the moves to the list.
-        '''
-        self.getBishopMoves(row, col, moves)
-        self.getRookMoves(row, col, moves)
+    """
+    Returns the bitboard of the enemy pieces giving check and a dict from the square of each pinned ally piece
+    to the squares it may still move to, the line between the king and the pinning piece.
+    Results are cached by the position's Zobrist key, so a position reached again costs one dict lookup.
+    """
 
-    def getKingMoves(self, row, col, moves):
+    def getCheckersAndPins(self):
+        pinCache = self.pinCache
+        key = self.zobristKey
+        cached = pinCache.get(key)
+        if cached is not None:
+            return cached
+        color = WHITE if self.whiteToMove else BLACK
+        enemy = 6 - color * 6
+        bb = self.bb
+        allOcc = self.allOcc
+        ownOcc = self.occ[color]
+        kingSq = bb[color * 6 + KING].bit_length() - 1
+        checkers = KNIGHT_ATTACKS[kingSq] & bb[enemy + KNIGHT] | PAWN_ATTACKS[color][kingSq] & bb[enemy + PAWN]
+        pinLines = {}
+        # enemy sliders that would attack the king on an empty board
+        queens = bb[enemy + QUEEN]
+        snipers = ROOK_LINES[kingSq] & (bb[enemy + ROOK] | queens) | \
+            BISHOP_LINES[kingSq] & (bb[enemy + BISHOP] | queens)
+        while snipers:  # usually none or one, so scanned inline rather than through popLsb
+            sq = (snipers & -snipers).bit_length() - 1
+            snipers &= snipers - 1
+            between = BETWEEN[kingSq][sq]
+            blockers = between & allOcc
+            if not blockers:  #nothing in the way, so check
+                checkers |= 1 << sq
+            elif not blockers & (blockers - 1) and blockers & ownOcc:  #a single ally piece in the way is pinned
+                pinLines[blockers.bit_length() - 1] = between | 1 << sq
+        if len(pinCache) >= PIN_CACHE_SIZE:  # start over rather than grow without bound
+            pinCache.clear()
+        cached = pinCache[key] = checkers, pinLines or NO_PINS
+        return cached
+
+    def getKingMoves(self, sq, movesBuf, count):
         '''
-        Get all the king moves for the king located at row col and add the moves to the list.
+        Get all the king moves for the king located at square sq and write the moves into movesBuf from index count.
+        Returns the new move count.
         '''
-        row_moves = (-1, -1, -1, 0, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 0, 1, -1, 0, 1)
-        ally_color = "w" if self.whiteToMove else "b"
-        for i in range(8):
-            end_row = row + row_moves[i]
-            end_col = col + col_moves[i]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
-                    # place king on end square and check for checks
-                    if ally_color == "w":
-                        self.whiteKingLocation = (end_row, end_col)
-                    else:
-                        self.blackKingLocation = (end_row, end_col)
-                    in_check, pins, checks = self.checkForPinsAndChecks()
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    # place king back on original location
-                    if ally_color == "w":
-                        self.whiteKingLocation = (row, col)
-                    else:
-                        self.blackKingLocation = (row, col)
+        color = WHITE if self.whiteToMove else BLACK
+        return genKingMoves(sq, color * 6 + KING, self.occ[color], 1 - color, self.allOcc, self.board, self.bb,
+                            movesBuf, count)
 
 
 """
@@ -458,45 +1029,90 @@ It stores the start and end positions of the move, the piece that was moved, and
 
 
 class Move:
-    # Maps keys to values so that human-readable positions like (row, col) can be translated to chess notation like 'e4'
-    ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
-    rowsToRanks = {v: k for k, v in ranksToRows.items()}
-    filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
-    colsToFiles = {v: k for k, v in filesToCols.items()}
+    # Squares translate to chess notation like 'e4' through SQ_NAMES
+    # A Move only holds its packed move, every other field is decoded from it on access
+    __slots__ = ("moveID",)
 
     def __init__(self, startSq, endSq, board):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
-        self.isPawnPromotion = False
-        if (self.pieceMoved == "wp" and self.endRow == 0) or (self.pieceMoved == "bp" and self.endRow == 7):
-            self.isPawnPromotion = True
+        start = startSq[0] * 8 + startSq[1]
+        end = endSq[0] * 8 + endSq[1]
+        moved = board[start]
+        captured = board[end]
+        isPawnPromotion = (moved == PAWN and end < 8) or (moved == 6 + PAWN and end >= 56)
+
+        # The move ID is the packed int the engine generates and plays, so a clicked move can be matched against it
+        self.moveID = packMove(start, end, moved, captured, PROMOTION_FLAG if isPawnPromotion else 0)
+
+    """
+    Decodes a packed move from the engine back into a Move, for display.
+    """
 
-        # Assign a move ID to uniquely identify each move, useful for undo functionality and debugging
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+    @staticmethod
+    def fromInt(moveID):
+        move = Move.__new__(Move)
+        move.moveID = moveID
+        return move
+
+    """
+    The squares as row and col, the pieces as PIECE_NAMES and the promotion flag, read off the move ID.
+    """
+
+    @property
+    def startRow(self):
+        return (self.moveID & 0x3F) >> 3
+
+    @property
+    def startCol(self):
+        return self.moveID & 7
+
+    @property
+    def endRow(self):
+        return (self.moveID >> 6 & 0x3F) >> 3
+
+    @property
+    def endCol(self):
+        return self.moveID >> 6 & 7
+
+    @property
+    def pieceMoved(self):
+        return PIECE_NAMES[self.moveID >> 12 & 0xF]
+
+    @property
+    def pieceCaptured(self):
+        return PIECE_NAMES[self.moveID >> 16 & 0xF]
+
+    @property
+    def isPawnPromotion(self):
+        return bool(self.moveID >> 20 & PROMOTION_FLAG)
 
     """
     Overriding the equals method to allow easy comparison between moves.
+    A Move also equals its packed move, and hashes like it, so it can be looked up in a set of the packed
+    moves the engine generates.
     """
 
     def __eq__(self, other):
-        if isinstance(other, Move):
+        if other is self:
+            return True
+        if type(other) is Move:
             return self.moveID == other.moveID
-        return False
+        if type(other) is int:
+            return self.moveID == other
+        return NotImplemented
+
+    def __hash__(self):
+        return self.moveID
 
     """
     Converts the move into chess notation (e.g., 'e2e4') by translating row and column indices.
     """
 
     def getChessNotation(self):
-        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+        return moveNotation(self.moveID)
 
     """
     Converts row and column into human-readable chess coordinates like 'e4'.
     """
 
     def getRankFile(self, r, c):
-        return self.colsToFiles[c] + self.rowsToRanks[r]
+        return SQ_NAMES[r * 8 + c]
@@ -7,13 +7,21 @@ DIMENSION = 8  # dimensions of a chess board are 8x8
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15  # for animations
 IMAGES = {}
+BOARD_SURFACE = None  # the empty board, drawn once by loadImages
+# The screen rect of every square, row by row, made once instead of every frame
+SQUARE_RECTS = [p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE) for r in range(DIMENSION) for c in range(DIMENSION)]
 
 
 def loadImages():
+    global BOARD_SURFACE
     pieces = ['wp', 'wR', 'wB', 'wN', 'wK', 'wQ', 'bp', 'bR', 'bN', 'bB', 'bK', 'bQ']
     for piece in pieces:
-        IMAGES[piece] = p.transform.scale(p.image.load("images/" + piece + ".png"), (SQ_SIZE, SQ_SIZE))
+        # convert_alpha once to the display's pixel format, so blitting doesn't convert every frame
+        IMAGES[piece] = p.transform.scale(p.image.load("images/" + piece + ".png").convert_alpha(), (SQ_SIZE, SQ_SIZE))
     # Note: we can access an image by saying 'IMAGES['wp]'
+    # The empty board never changes, so its squares are drawn once and the whole surface is blitted each frame
+    BOARD_SURFACE = p.Surface((WIDTH, HEIGHT)).convert()
+    drawBoard(BOARD_SURFACE)
 
 
 def main():
@@ -22,8 +30,9 @@ def main():
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     gs = ChessEngine.GameState()
-    validMoves = gs.getValidMoves()
+    validMoves = set(gs.getValidMoves())
     moveMade = False #flag variable for when a move is made
+    redraw = True #flag variable for when the screen is out of date
     loadImages()  # only do this once, before the while loop
     running = True
     sqSelected = () #no sqaure selected initially
@@ -33,6 +42,8 @@ def main():
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+            elif e.type == p.VIDEOEXPOSE: #the window has to be painted again, e.g. after being uncovered
+                redraw = True
             #mouse handlers
             elif e.type == p.MOUSEBUTTONDOWN:
                 location = p.mouse.get_pos()
@@ -47,47 +58,52 @@ def main():
                 if len(playerClicks) == 2: #after 2nd click
                     move = ChessEngine.Move(playerClicks[0], playerClicks[1], gs.board)
                     print(move.getChessNotation())
-                    for i in range(len(validMoves)):
-                        if move == validMoves[i]:
-                            gs.makeMove(validMoves[i])
-                            moveMade = True
-                            sqSelected = () #reset user clicks
-                            playerClicks = []
+                    if move in validMoves:
+                        gs.makeMove(move.moveID)
+                        moveMade = True
+                        sqSelected = () #reset user clicks
+                        playerClicks = []
                     if not moveMade:
                         playerClicks = [sqSelected]
 
             #key handlers
             elif e.type == p.KEYDOWN:
-                if e.key == p.K_z: #undo when 'z' is pressed
+                if e.key == p.K_z and gs.moveLog: #undo when 'z' is pressed and there is a move to undo
                     gs.undoMove()
                     moveMade = True
         if moveMade:
-            validMoves = gs.getValidMoves()
+            validMoves = set(gs.getValidMoves())
             moveMade = False
-        drawGameState(screen, gs)
+            redraw = True
+        if redraw: #nothing is drawn while the position stays the same
+            drawGameState(screen, gs)
+            p.display.flip()
+            redraw = False
         clock.tick(MAX_FPS)
-        p.display.flip()
 
 
 def drawGameState(screen, gs):
-    drawBoard(screen)  # Draw square on the board
-    drawPieces(screen, gs.board)  # Draw pieces on top of those squares
+    screen.blit(BOARD_SURFACE, (0, 0))  # Draw square on the board
+    drawPieces(screen, gs.bb)  # Draw pieces on top of those squares
 
 
 def drawBoard(screen):
     colors = [p.Color('white'), p.Color("gray")]
+    drawRect = p.draw.rect
     for r in range(DIMENSION):
         for c in range(DIMENSION):
             color = colors[((r + c) % 2)]
-            p.draw.rect(screen, color, p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+            drawRect(screen, color, SQUARE_RECTS[r * 8 + c])
 
 
-def drawPieces(screen, board):
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            piece = board[r][c]
-            if piece != "--":  # not an empty square
-                screen.blit(IMAGES[piece], p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+def drawPieces(screen, bb):
+    # Walk each piece type's bitboard, so only occupied squares are visited
+    blit = screen.blit
+    squaresOf = ChessEngine.squaresOf
+    for piece in range(ChessEngine.EMPTY):
+        image = IMAGES[ChessEngine.PIECE_NAMES[piece]]
+        for sq in squaresOf(bb[piece]):
+            blit(image, SQUARE_RECTS[sq])
 
 
 if __name__ == "__main__":